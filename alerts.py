@@ -0,0 +1,184 @@
+import json
+import time
+import warnings
+
+
+# Alerting for low stock and warehouse fill levels
+
+class AlertEngine:
+    def __init__(self, default_fill_threshold=None):
+        """
+        Initalise the AlertEngine with no thresholds and no sinks.
+
+        :param default_fill_threshold: Fill ratio (0-1) used for warehouses without their own threshold
+        :type default_fill_threshold: float
+        :raise ValueError: If default_fill_threshold is not between 0 and 1
+        """
+        self._reorder_points = {}
+        self._fill_thresholds = {}
+        self._default_fill_threshold = None
+        if default_fill_threshold is not None:
+            self.set_fill_threshold(default_fill_threshold)
+        self._sinks = []
+        # Keys of the (warehouse, item) pairs and warehouses currently over their threshold
+        self._low_stock = set()
+        self._over_capacity = set()
+
+
+    def add_sink(self, sink):
+        """
+        Add a sink which every event is passed to.
+
+        :param sink: Callable taking a single event dictionary, e.g. a function, JsonlSink or StdoutSink
+        :type sink: callable
+        """
+        self._sinks.append(sink)
+
+
+    def set_reorder_point(self, item, level):
+        """
+        Set the reorder point of an item. Stock at or below this level is low.
+
+        :param item: Item ID or item name
+        :type item: str
+        :param level: Number of items at or below which an alert is raised
+        :type level: int
+        """
+        self._reorder_points[str(item)] = int(level)
+
+
+    def set_fill_threshold(self, ratio, warehouse=None):
+        """
+        Set the fill level threshold of a warehouse, or the default threshold for all warehouses.
+
+        :param ratio: Storage space used / capacity, at or above which an alert is raised
+        :type ratio: float
+        :param warehouse: Name of warehouse, or None to set the default
+        :type warehouse: str
+        :raise ValueError: If ratio is not between 0 and 1
+        """
+        if not 0 < ratio <= 1:
+            raise ValueError("Fill threshold must be between 0 and 1")
+        if warehouse is None:
+            self._default_fill_threshold = ratio
+        else:
+            self._fill_thresholds[warehouse] = ratio
+
+
+    def check_item(self, warehouse, item_id, item_name, quantity):
+        """
+        Check the stock level of one item after it has changed, emitting an event if it crossed its reorder point.
+
+        :param warehouse: Name of warehouse
+        :type warehouse: str
+        :param item_id: ID of item
+        :type item_id: str
+        :param item_name: Name of item
+        :type item_name: str
+        :param quantity: New number of item in warehouse
+        :type quantity: int
+        """
+        level = self._reorder_points.get(item_id, self._reorder_points.get(item_name))
+        if level is None:
+            return
+
+        key = (warehouse, item_id)
+        low = quantity <= level
+        # Only emit when the state changes, so repeated mutations below the level stay quiet
+        if low and key not in self._low_stock:
+            self._low_stock.add(key)
+            self._emit("low_stock", warehouse, item_id=item_id, item_name=item_name, quantity=quantity, threshold=level)
+        elif not low and key in self._low_stock:
+            self._low_stock.remove(key)
+            self._emit("restocked", warehouse, item_id=item_id, item_name=item_name, quantity=quantity, threshold=level)
+
+
+    def check_capacity(self, warehouse, size, capacity):
+        """
+        Check the fill level of a warehouse after it has changed, emitting an event if it crossed its threshold.
+
+        :param warehouse: Name of warehouse
+        :type warehouse: str
+        :param size: Storage space used in warehouse
+        :type size: int
+        :param capacity: Capacity of warehouse
+        :type capacity: int
+        """
+        ratio = self._fill_thresholds.get(warehouse, self._default_fill_threshold)
+        if ratio is None or capacity <= 0:
+            return
+
+        fill = size / capacity
+        over = fill >= ratio
+        if over and warehouse not in self._over_capacity:
+            self._over_capacity.add(warehouse)
+            self._emit("capacity", warehouse, size=size, capacity=capacity, threshold=ratio)
+        elif not over and warehouse in self._over_capacity:
+            self._over_capacity.remove(warehouse)
+            self._emit("capacity_cleared", warehouse, size=size, capacity=capacity, threshold=ratio)
+
+
+    def _emit(self, event_type, warehouse, **data):
+        """
+        Build an event and pass it to every sink.
+
+        :param event_type: One of low_stock, restocked, capacity or capacity_cleared
+        :type event_type: str
+        :param warehouse: Name of warehouse
+        :type warehouse: str
+        """
+        event = {"type": event_type, "warehouse": warehouse, "time": time.time()}
+        event.update(data)
+        for sink in self._sinks:
+            # A failing sink is reported as a warning, so it cannot stop the other sinks or the stock change
+            try:
+                sink(event)
+            except Exception as error:
+                warnings.warn(f"Alert sink {sink!r} failed: {error}")
+
+
+class JsonlSink:
+    def __init__(self, path):
+        """
+        Initalise the JsonlSink, appending one JSON object per line to the file at path.
+
+        :param path: Path of the .jsonl file
+        :type path: str
+        """
+        self._file = open(path, "a")
+
+
+    def __call__(self, event):
+        """
+        Append an event to the file as one line of JSON.
+
+        :param event: Event from an AlertEngine
+        :type event: dict
+        """
+        self._file.write(json.dumps(event) + "\n")
+        self._file.flush()
+
+
+    def close(self):
+        """
+        Close the underlying file.
+        """
+        self._file.close()
+
+
+class StdoutSink:
+    """
+    Sink which prints a one line summary of each event.
+    """
+
+    def __call__(self, event):
+        """
+        Print a one line summary of an event.
+
+        :param event: Event from an AlertEngine
+        :type event: dict
+        """
+        if event["type"] in ("low_stock", "restocked"):
+            print(f"\nAlert [{event['warehouse']}]: {event['type']} {event['item_name']} ({event['quantity']}/{event['threshold']})")
+        else:
+            print(f"\nAlert [{event['warehouse']}]: {event['type']} {event['size']}/{event['capacity']}")
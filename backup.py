@@ -0,0 +1,324 @@
+import os
+import sys
+import time
+import zlib
+import struct
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from project import is_warehouse_file
+
+
+# Streaming compressed backup and restore of every warehouse and the catalog
+
+MAGIC = b"WHBACKUP1\n"
+CHUNK_SIZE = 1 << 20
+# Largest compressed chunk accepted on restore, zlib adds a little to data which does not compress
+MAX_COMPRESSED_SIZE = CHUNK_SIZE + (CHUNK_SIZE >> 8) + 64
+CATALOG = "catalog.csv"
+
+# Archive header: time the backup started, 1 if incremental
+HEADER = struct.Struct(">dB")
+# File record: name length, file size, followed by the name
+FILE = struct.Struct(">HQ")
+# Chunk record: raw length, compressed length, crc32 of raw data, followed by the compressed data
+CHUNK = struct.Struct(">III")
+# End record: number of files
+END = struct.Struct(">I")
+# Seconds taken off the previous backup time, as file times can lag the clock; extra files are harmless, missed ones are not
+MTIME_SLACK = 1.0
+
+
+def backup(archive, directory=".", since=None, workers=None, level=6):
+    """
+    Stream every warehouse and the catalog in directory into a single compressed archive.
+
+    :param archive: Path of the archive to create
+    :type archive: str
+    :param directory: Directory holding the warehouse .csv files and catalog
+    :type directory: str
+    :param since: Path of a previous archive, so only files changed since it started are included
+    :type since: str
+    :param workers: Number of threads compressing chunks, defaults to the number of cores
+    :type workers: int
+    :param level: zlib compression level
+    :type level: int
+    :return: Number of files in the archive
+    :rtype: int
+    """
+    started = time.time()
+    changed_after = read_header(since)[0] - MTIME_SLACK if since else None
+    workers = workers or os.cpu_count() or 1
+
+    temp = archive + ".tmp"
+    try:
+        with open(temp, "wb") as out, ThreadPoolExecutor(workers) as pool:
+            out.write(MAGIC)
+            out.write(HEADER.pack(started, since is not None))
+            count = _write_files(out, pool, directory, changed_after, workers, level)
+            out.write(b"Z" + END.pack(count))
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    os.replace(temp, archive)
+    return count
+
+
+def _write_files(out, pool, directory, changed_after, workers, level):
+    """
+    Write a file record and chunk records for each file, compressing chunks in parallel.
+
+    :param out: Open archive
+    :param pool: Threads compressing chunks
+    :type pool: ThreadPoolExecutor
+    :param directory: Directory holding the warehouse .csv files and catalog
+    :type directory: str
+    :param changed_after: Only include files modified at or after this time, or None for all files
+    :type changed_after: float
+    :param workers: Number of threads compressing chunks
+    :type workers: int
+    :param level: zlib compression level
+    :type level: int
+    :raise ValueError: If a file shrinks while being backed up
+    :return: Number of files written
+    :rtype: int
+    """
+    count = 0
+    # Records waiting to be written in order, either bytes or futures of compressed chunks.
+    # Bounded so memory does not grow with fleet size.
+    pending = deque()
+    for name, path in backup_files(directory):
+        if changed_after is not None and os.stat(path).st_mtime < changed_after:
+            continue
+        count += 1
+        encoded = name.encode()
+        with open(path, "rb") as f:
+            # Size of the file opened, as the path may be replaced by a new file at any time
+            size = os.fstat(f.fileno()).st_size
+            pending.append(b"F" + FILE.pack(len(encoded), size) + encoded)
+            written = 0
+            while written < size:
+                chunk = f.read(min(CHUNK_SIZE, size - written))
+                if not chunk:
+                    raise ValueError(f"{name} changed during backup")
+                written += len(chunk)
+                pending.append(pool.submit(_compress, chunk, level))
+                while len(pending) > workers * 4:
+                    _write_record(out, pending.popleft())
+    while pending:
+        _write_record(out, pending.popleft())
+    return count
+
+
+def _write_record(out, record):
+    """
+    Write a record, waiting for it to be compressed if needed.
+
+    :param out: Open archive
+    :param record: Record bytes, or future of record bytes
+    """
+    out.write(record if isinstance(record, bytes) else record.result())
+
+
+def restore(archive, directory="."):
+    """
+    Restore every file in an archive into directory, validating all checksums before any file is replaced.
+    Files are then replaced one at a time, each atomically.
+
+    An incremental archive only holds changed files, so it must be restored on top of its full backup.
+    Deleted warehouses are not tracked, so files deleted since the full backup are restored by it.
+
+    :param archive: Path of the archive
+    :type archive: str
+    :param directory: Directory to restore the warehouse .csv files and catalog into
+    :type directory: str
+    :raise ValueError: If the archive is invalid, truncated, or a checksum does not match,
+        or it is incremental and directory holds no backup to restore it on top of
+    :return: Number of files restored
+    :rtype: int
+    """
+    if read_header(archive)[1] and not (os.path.isdir(directory) and any(backup_files(directory))):
+        raise ValueError("Incremental backup must be restored on top of a full backup")
+    os.makedirs(directory, exist_ok=True)
+    temps = {}
+    # Name, expected size, size restored and open temporary file of the file being restored
+    current = None
+    try:
+        with open(archive, "rb") as f:
+            _read_magic(f)
+            _read(f, HEADER.size)
+            while True:
+                kind = _read(f, 1)
+                if kind == b"F":
+                    _finish(current)
+                    length, size = FILE.unpack(_read(f, FILE.size))
+                    name = _read(f, length).decode()
+                    if name != os.path.basename(name) or name in ("", ".", ".."):
+                        raise ValueError(f"Invalid file name in archive: {name}")
+                    path = os.path.join(directory, name)
+                    temps[path] = path + ".restore.tmp"
+                    current = [name, size, 0, open(temps[path], "wb")]
+                elif kind == b"C":
+                    if current is None:
+                        raise ValueError("Chunk outside of a file in archive")
+                    raw_length, length, crc = CHUNK.unpack(_read(f, CHUNK.size))
+                    # Lengths are checked before reading, so a corrupt chunk cannot use unbounded memory
+                    if not 0 < raw_length <= CHUNK_SIZE or length > MAX_COMPRESSED_SIZE:
+                        raise ValueError(f"Corrupt chunk in {current[0]}")
+                    decompressor = zlib.decompressobj()
+                    try:
+                        data = decompressor.decompress(_read(f, length), raw_length)
+                    except zlib.error:
+                        raise ValueError(f"Corrupt chunk in {current[0]}")
+                    if decompressor.unconsumed_tail or not decompressor.eof:
+                        raise ValueError(f"Corrupt chunk in {current[0]}")
+                    if len(data) != raw_length or zlib.crc32(data) != crc:
+                        raise ValueError(f"Checksum mismatch in {current[0]}")
+                    current[2] += len(data)
+                    current[3].write(data)
+                elif kind == b"Z":
+                    _finish(current)
+                    current = None
+                    if END.unpack(_read(f, END.size))[0] != len(temps):
+                        raise ValueError("File count mismatch in archive")
+                    break
+                else:
+                    raise ValueError("Invalid record in archive")
+    except BaseException:
+        if current is not None:
+            current[3].close()
+        for temp in temps.values():
+            if os.path.exists(temp):
+                os.remove(temp)
+        raise
+
+    # Every file is valid, so replace them. Each file is replaced atomically, but one at a time,
+    # so a failure part way leaves some files restored and the rest as they were.
+    remaining = dict(temps)
+    try:
+        for path, temp in temps.items():
+            os.replace(temp, path)
+            del remaining[path]
+    finally:
+        for temp in remaining.values():
+            if os.path.exists(temp):
+                os.remove(temp)
+    return len(temps)
+
+
+def read_header(archive):
+    """
+    Read the header of an archive.
+
+    :param archive: Path of the archive
+    :type archive: str
+    :raise ValueError: If the file is not an archive
+    :return: Time the backup started, and whether it is incremental
+    :rtype: tuple
+    """
+    with open(archive, "rb") as f:
+        _read_magic(f)
+        started, incremental = HEADER.unpack(_read(f, HEADER.size))
+    return started, bool(incremental)
+
+
+def backup_files(directory):
+    """
+    Find the catalog and every warehouse .csv file in directory.
+
+    :param directory: Directory holding the warehouse .csv files and catalog
+    :type directory: str
+    :return: Generator of (file name, path) pairs, sorted by name
+    """
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        if not entry.name.endswith(".csv") or not entry.is_file():
+            continue
+        if entry.name == CATALOG or is_warehouse_file(entry.path):
+            yield entry.name, entry.path
+
+
+def _compress(chunk, level):
+    """
+    Compress one chunk into a chunk record. Runs in a worker thread, as zlib releases the GIL.
+
+    :param chunk: Raw data
+    :type chunk: bytes
+    :param level: zlib compression level
+    :type level: int
+    :rtype: bytes
+    """
+    data = zlib.compress(chunk, level)
+    return b"C" + CHUNK.pack(len(chunk), len(data), zlib.crc32(chunk)) + data
+
+
+def _finish(current):
+    """
+    Close the file being restored, checking all of it was in the archive.
+
+    :param current: Name, expected size, size restored and open file, or None
+    :type current: list
+    :raise ValueError: If the file is not the expected size
+    """
+    if current is None:
+        return
+    name, size, restored, f = current
+    f.close()
+    if restored != size:
+        raise ValueError(f"{name} is truncated in archive")
+
+
+def _read_magic(f):
+    """
+    Check a file starts with the archive magic bytes.
+
+    :raise ValueError: If it does not
+    """
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a warehouse backup")
+
+
+def _read(f, size):
+    """
+    Read exactly size bytes.
+
+    :raise ValueError: If the archive ends first
+    :rtype: bytes
+    """
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Archive is truncated")
+    return data
+
+
+def main():
+    """
+    Run the backup or restore command from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Back up or restore every warehouse and the catalog.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backup_parser = commands.add_parser("backup", help="create an archive")
+    backup_parser.add_argument("archive")
+    backup_parser.add_argument("-d", "--directory", default=".")
+    backup_parser.add_argument("-s", "--since", help="previous archive, to only include files changed since it")
+    backup_parser.add_argument("-w", "--workers", type=int)
+    restore_parser = commands.add_parser("restore", help="restore an archive")
+    restore_parser.add_argument("archive")
+    restore_parser.add_argument("-d", "--directory", default=".")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "backup":
+            count = backup(args.archive, args.directory, args.since, args.workers)
+            print(f"Backed up {count} files to {args.archive}")
+        else:
+            count = restore(args.archive, args.directory)
+            print(f"Restored {count} files from {args.archive}")
+    except (OSError, ValueError) as error:
+        sys.exit(f"Error: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import tempfile
+from project import Warehouse
+from persistence import WriteBehind
+
+
+# Compare add/remove throughput of the write-per-call behaviour against write-behind durability levels
+
+WAREHOUSES = 20
+MUTATIONS = 2000
+
+
+def run(writer):
+    """
+    Run MUTATIONS stock changes spread over WAREHOUSES warehouses, including the final flush.
+
+    :param writer: Write-behind writer, or None for a write on every call
+    :type writer: WriteBehind
+    :return: Mutations per second
+    :rtype: float
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        warehouses = [Warehouse(os.path.join(directory, f"w{i}.csv"), writer=writer) for i in range(WAREHOUSES)]
+        start = time.perf_counter()
+        for i in range(MUTATIONS):
+            # Each add and its matching remove go to the same warehouse, so no warehouse fills up
+            # and every call changes stock and is saved
+            warehouse = warehouses[(i // 2) % WAREHOUSES]
+            if i % 2 == 0:
+                assert warehouse.add_stock("1", 1) == True
+            else:
+                assert warehouse.remove_stock("1", 1) == "1"
+        if writer:
+            writer.close()
+        return MUTATIONS / (time.perf_counter() - start)
+
+
+def main():
+    """
+    Print throughput of each mode.
+    """
+    results = [("write per call", run(None))]
+    for durability in ("none", "interval", "fsync"):
+        results.append((f"write-behind ({durability})", run(WriteBehind(durability=durability))))
+    baseline = results[0][1]
+    for mode, rate in results:
+        print(f"{mode:28} {rate:10.0f} mutations/s  {rate / baseline:5.1f}x")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,21 @@
+import pytest
+import os
+import shutil
+from project import Warehouse
+
+
+@pytest.fixture
+def fleet_dir(tmp_path):
+    directory = os.path.join(tmp_path, "fleet")
+    os.makedirs(directory)
+    shutil.copy("catalog.csv", directory)
+    london = Warehouse(os.path.join(directory, "london.csv"))
+    london.add_stock("AirPods", 10)
+    london.add_stock("AeroPress", 5)
+    paris = Warehouse(os.path.join(directory, "paris.csv"))
+    paris.add_stock("AirPods", 4)
+    paris.add_stock("Camping Tent", 4)
+    # Not a warehouse, so should be skipped
+    with open(os.path.join(directory, "notes.csv"), "w") as notes:
+        notes.write("a,b\n")
+    return directory
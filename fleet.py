@@ -0,0 +1,391 @@
+import os
+import csv
+import numpy as np
+from scipy import sparse
+from project import is_warehouse_file
+
+
+# Columnar snapshot of every warehouse for fleet-wide analytics
+
+class FleetSnapshot:
+    def __init__(self, warehouses, capacities, item_ids, item_names, sizes, weights, quantities):
+        """
+        Initalise the FleetSnapshot from already built arrays. Use build() or load() to create one.
+
+        :param warehouses: Names of warehouses, one per matrix row
+        :type warehouses: list
+        :param capacities: Capacity of each warehouse
+        :type capacities: numpy.ndarray
+        :param item_ids: Catalog item IDs, one per matrix column
+        :type item_ids: list
+        :param item_names: Catalog item names, one per matrix column
+        :type item_names: list
+        :param sizes: Item size of each catalog item
+        :type sizes: numpy.ndarray
+        :param weights: Item weight(kg) of each catalog item
+        :type weights: numpy.ndarray
+        :param quantities: Warehouse x item matrix of number of items stocked
+        :type quantities: scipy.sparse.csr_matrix
+        """
+        self._warehouses = list(warehouses)
+        self._rows = {name: i for i, name in enumerate(self._warehouses)}
+        self._capacities = np.asarray(capacities, dtype=np.int64)
+        self._item_ids = list(item_ids)
+        self._item_names = list(item_names)
+        self._columns = {item: i for i, item in enumerate(self._item_ids)}
+        self._columns.update({item: i for i, item in enumerate(self._item_names)})
+        self._sizes = np.asarray(sizes, dtype=np.int64)
+        self._weights = np.asarray(weights, dtype=np.float64)
+        self._quantities = sparse.csr_matrix(quantities, dtype=np.int64)
+        # Changes from apply() not yet folded into the matrix, as {(row, column): change}
+        self._pending = {}
+        # Capacities of warehouses added since the last fold, whose rows are not in the matrix yet
+        self._new_capacities = []
+
+
+    @classmethod
+    def build(cls, directory=".", catalog="catalog.csv", writer=None):
+        """
+        Build a snapshot by loading the catalog and every warehouse .csv file in directory.
+
+        :param directory: Directory holding the warehouse .csv files
+        :type directory: str
+        :param catalog: Path of the catalog .csv file
+        :type catalog: str
+        :param writer: Write-behind writer used by the warehouses, so changes not yet written are included
+        :type writer: WriteBehind
+        :return: A snapshot of all warehouses
+        :rtype: FleetSnapshot
+        """
+        item_ids, item_names, sizes, weights = [], [], [], []
+        with open(catalog, "r") as cat:
+            reader = csv.reader(cat)
+            next(reader)
+            for row in reader:
+                item_ids.append(row[0])
+                item_names.append(row[1])
+                weights.append(float(row[2]))
+                sizes.append(int(row[3]))
+        columns = {item: i for i, item in enumerate(item_ids)}
+
+        warehouses, capacities, rows, cols, data = [], [], [], [], []
+        catalog_name = os.path.basename(catalog)
+        for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+            if not entry.name.endswith(".csv") or entry.name == catalog_name or not is_warehouse_file(entry.path):
+                continue
+            # The csv file misses changes still waiting in the writer
+            contents = writer.read(entry.path) if writer else None
+            if contents is None:
+                with open(entry.path, "r") as inventory:
+                    contents = list(csv.reader(inventory))
+            row_index = len(warehouses)
+            warehouses.append(entry.name)
+            capacities.append(int(contents[0][1]))
+            # Skip the presets and header rows
+            for row in contents[3:]:
+                if row[0] in columns:
+                    rows.append(row_index)
+                    cols.append(columns[row[0]])
+                    data.append(int(row[2]))
+
+        quantities = sparse.csr_matrix(
+            (np.array(data, dtype=np.int64), (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64))),
+            shape=(len(warehouses), len(item_ids)),
+        )
+        return cls(warehouses, capacities, item_ids, item_names, sizes, weights, quantities)
+
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a snapshot previously written by save().
+
+        :param path: Path of the .npz file
+        :type path: str
+        :return: The saved snapshot
+        :rtype: FleetSnapshot
+        """
+        with np.load(path) as f:
+            quantities = sparse.csr_matrix((f["data"], f["indices"], f["indptr"]), shape=tuple(f["shape"]))
+            return cls(
+                f["warehouses"].tolist(), f["capacities"], f["item_ids"].tolist(), f["item_names"].tolist(),
+                f["sizes"], f["weights"], quantities,
+            )
+
+
+    def save(self, path):
+        """
+        Save the snapshot to an uncompressed .npz file for fast reloading.
+
+        :param path: Path of the .npz file
+        :type path: str
+        """
+        quantities = self.quantities()
+        np.savez(
+            path,
+            warehouses=np.array(self._warehouses, dtype=str),
+            capacities=self._capacities,
+            item_ids=np.array(self._item_ids, dtype=str),
+            item_names=np.array(self._item_names, dtype=str),
+            sizes=self._sizes,
+            weights=self._weights,
+            data=quantities.data,
+            indices=quantities.indices,
+            indptr=quantities.indptr,
+            shape=np.array(quantities.shape),
+        )
+
+
+    def apply(self, warehouse, item, change, capacity=50):
+        """
+        Record a change in the number of an item stocked, without reloading any warehouse.
+
+        :param warehouse: Path of warehouse, a new empty row is added if it is not in the snapshot and has no file yet
+        :type warehouse: str
+        :param item: Item ID or item name
+        :type item: str
+        :param change: Number of items added (positive) or removed (negative)
+        :type change: int
+        :param capacity: Capacity used if the warehouse is new
+        :type capacity: int
+        :raise ValueError: If item is not in catalog, or warehouse already has stock on disk but is not in the snapshot
+        """
+        name = os.path.basename(warehouse)
+        column = self._columns.get(str(item))
+        if column is None:
+            raise ValueError("Item not in catalog")
+        if name not in self._rows:
+            # Its existing stock is unknown, so a change alone would leave the row wrong
+            if os.path.exists(warehouse):
+                raise ValueError(f"{name} is not in the snapshot, add it with add_warehouse()")
+            self._add_row(name, capacity)
+        key = (self._rows[name], column)
+        self._pending[key] = self._pending.get(key, 0) + int(change)
+
+
+    def add_warehouse(self, warehouse, rows):
+        """
+        Add a warehouse which is not in the snapshot, from its current contents.
+
+        :param warehouse: Path of warehouse
+        :type warehouse: str
+        :param rows: Rows of the warehouse, as stored in its .csv file
+        :type rows: list
+        :raise ValueError: If warehouse is already in the snapshot
+        """
+        name = os.path.basename(warehouse)
+        if name in self._rows:
+            raise ValueError(f"{name} is already in the snapshot")
+        row_index = self._add_row(name, int(rows[0][1]))
+        # Skip the presets and header rows
+        for row in rows[3:]:
+            column = self._columns.get(str(row[0]))
+            if column is not None:
+                key = (row_index, column)
+                self._pending[key] = self._pending.get(key, 0) + int(row[2])
+
+
+    def __contains__(self, warehouse):
+        """
+        Check if a warehouse is in the snapshot.
+
+        :param warehouse: Path or name of warehouse
+        :type warehouse: str
+        :rtype: bool
+        """
+        return os.path.basename(warehouse) in self._rows
+
+
+    def _add_row(self, name, capacity):
+        """
+        Add a row for a new warehouse. The matrix is only grown in _fold(), so adding many warehouses stays cheap.
+
+        :param name: Name of warehouse
+        :type name: str
+        :param capacity: Capacity of warehouse
+        :type capacity: int
+        :return: Index of the new row
+        :rtype: int
+        """
+        row_index = len(self._warehouses)
+        self._rows[name] = row_index
+        self._warehouses.append(name)
+        self._new_capacities.append(capacity)
+        return row_index
+
+
+    def _fold(self):
+        """
+        Grow the matrix for any new warehouses, then add the pending changes in one sparse addition.
+        """
+        if self._new_capacities:
+            self._capacities = np.concatenate([self._capacities, np.array(self._new_capacities, dtype=np.int64)])
+            self._quantities.resize((len(self._warehouses), len(self._item_ids)))
+            self._new_capacities = []
+        if not self._pending:
+            return
+        keys = np.array(list(self._pending.keys()), dtype=np.int64)
+        changes = np.array(list(self._pending.values()), dtype=np.int64)
+        delta = sparse.csr_matrix((changes, (keys[:, 0], keys[:, 1])), shape=self._quantities.shape)
+        self._quantities = self._quantities + delta
+        self._quantities.eliminate_zeros()
+        self._pending = {}
+
+
+    def quantities(self):
+        """
+        Get the warehouse x item matrix of number of items stocked.
+
+        :return: Rows follow warehouses(), columns follow the catalog order
+        :rtype: scipy.sparse.csr_matrix
+        """
+        self._fold()
+        return self._quantities
+
+
+    def warehouses(self):
+        """
+        Get the names of warehouses in row order.
+
+        :rtype: list
+        """
+        return list(self._warehouses)
+
+
+    def item_totals(self):
+        """
+        Get the total number of each item across all warehouses.
+
+        :return: One total per catalog item, in catalog order
+        :rtype: numpy.ndarray
+        """
+        return np.asarray(self.quantities().sum(axis=0)).ravel()
+
+
+    def item_total(self, item):
+        """
+        Get the total number of one item across all warehouses.
+
+        :param item: Item ID or item name
+        :type item: str
+        :raise ValueError: If item is not in catalog
+        :rtype: int
+        """
+        column = self._columns.get(str(item))
+        if column is None:
+            raise ValueError("Item not in catalog")
+        return int(self.quantities()[:, column].sum())
+
+
+    def storage_used(self):
+        """
+        Get the storage space used by each warehouse.
+
+        :return: Number of items * item size, per warehouse
+        :rtype: numpy.ndarray
+        """
+        return self.quantities() @ self._sizes
+
+
+    def weight_stored(self):
+        """
+        Get the total weight(kg) stored in each warehouse.
+
+        :return: Number of items * item weight, per warehouse
+        :rtype: numpy.ndarray
+        """
+        return self.quantities() @ self._weights
+
+
+    def fill_ratios(self):
+        """
+        Get the storage space used / capacity of each warehouse.
+
+        :rtype: numpy.ndarray
+        """
+        # Folds first, so capacities of new warehouses are included
+        used = self.storage_used()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return used / self._capacities
+
+
+    def top_items(self, n=10):
+        """
+        Get the n items with the most stock across all warehouses.
+
+        :param n: Number of items
+        :type n: int
+        :return: A list of (item name, total) pairs, largest first
+        :rtype: list
+        """
+        totals = self.item_totals()
+        return [(self._item_names[i], int(totals[i])) for i in _top(totals, n)]
+
+
+    def top_warehouses(self, n=10, by="fill"):
+        """
+        Get the n warehouses with the highest fill ratio, storage space used, or weight stored.
+
+        :param n: Number of warehouses
+        :type n: int
+        :param by: One of fill, size or weight
+        :type by: str
+        :raise ValueError: If by is not a valid option
+        :return: A list of (warehouse name, value) pairs, largest first
+        :rtype: list
+        """
+        if by == "fill":
+            values = self.fill_ratios()
+        elif by == "size":
+            values = self.storage_used()
+        elif by == "weight":
+            values = self.weight_stored()
+        else:
+            raise ValueError("by must be fill, size or weight")
+        return [(self._warehouses[i], values[i].item()) for i in _top(values, n)]
+
+
+    def warehouses_where(self, min_fill=None, max_fill=None, stocks=None):
+        """
+        Get the warehouses matching every given filter.
+
+        :param min_fill: Lowest fill ratio allowed
+        :type min_fill: float
+        :param max_fill: Highest fill ratio allowed
+        :type max_fill: float
+        :param stocks: Item ID or item name which must be stocked
+        :type stocks: str
+        :raise ValueError: If stocks is not in catalog
+        :return: A list of warehouse names
+        :rtype: list
+        """
+        mask = np.ones(len(self._warehouses), dtype=bool)
+        if min_fill is not None or max_fill is not None:
+            fill = self.fill_ratios()
+            if min_fill is not None:
+                mask &= fill >= min_fill
+            if max_fill is not None:
+                mask &= fill <= max_fill
+        if stocks is not None:
+            column = self._columns.get(str(stocks))
+            if column is None:
+                raise ValueError("Item not in catalog")
+            mask &= self.quantities()[:, column].toarray().ravel() > 0
+        return [self._warehouses[i] for i in np.flatnonzero(mask)]
+
+
+def _top(values, n):
+    """
+    Get the indices of the n largest values, largest first, without sorting the whole array.
+
+    :param values: Values to rank
+    :type values: numpy.ndarray
+    :param n: Number of indices
+    :type n: int
+    :rtype: numpy.ndarray
+    """
+    n = min(n, len(values))
+    if n <= 0:
+        return np.array([], dtype=np.int64)
+    top = np.argpartition(-values, n - 1)[:n]
+    return top[np.argsort(-values[top], kind="stable")]
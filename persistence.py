@@ -0,0 +1,204 @@
+import os
+import csv
+import atexit
+import threading
+
+
+# Write-behind persistence for warehouse csv files
+
+DURABILITY_LEVELS = ("none", "interval", "fsync")
+# Seconds the background thread waits before retrying a group which failed to write
+RETRY_DELAY = 1.0
+
+
+class WriteBehind:
+    def __init__(self, durability="interval", max_batch=64, interval=0.05):
+        """
+        Initalise the WriteBehind writer and start its background thread.
+
+        Durability levels:
+        none - groups are written only when max_batch warehouses are dirty, or on flush()/close()
+        interval - groups are also written every interval seconds
+        fsync - as interval, and every file in a group is fsynced before the group is done
+
+        :param durability: One of none, interval or fsync
+        :type durability: str
+        :param max_batch: Number of dirty warehouses which triggers a group write
+        :type max_batch: int
+        :param interval: Longest time in seconds a change waits before being written
+        :type interval: float
+        :raise ValueError: If durability is not a valid level
+        """
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError("Durability must be none, interval or fsync")
+        self._durability = durability
+        self._max_batch = max_batch
+        self._interval = interval if durability != "none" else None
+        # Latest rows of each dirty warehouse, so many changes to one warehouse become one write
+        self._dirty = {}
+        # Rows of the group being written, still readable until every file in it is replaced
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        # Held while a group is being written, so flush() waits for a group already in progress
+        self._write_lock = threading.Lock()
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        # Make sure no acknowledged change is lost on a clean exit
+        atexit.register(self.close)
+
+
+    def write(self, path, rows):
+        """
+        Record the new contents of a warehouse and return without waiting for the disk.
+
+        :param path: Path of the warehouse csv file
+        :type path: str
+        :param rows: Rows of the warehouse, copied so later changes are not seen by the writer
+        :type rows: list
+        :raise RuntimeError: If the writer is closed
+        """
+        rows = [list(row) for row in rows]
+        # Same file by any path, so read() finds it however the path is written
+        path = os.path.abspath(path)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Writer is closed")
+            self._dirty[path] = rows
+            if len(self._dirty) >= self._max_batch:
+                self._wake.notify()
+
+
+    def read(self, path):
+        """
+        Get the contents of a warehouse which have not been written yet.
+
+        :param path: Path of the warehouse csv file
+        :type path: str
+        :return: A copy of the rows waiting to be written, or None if the warehouse is not dirty
+        :rtype: list
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            rows = self._dirty.get(path)
+            if rows is None:
+                rows = self._inflight.get(path)
+            if rows is None:
+                return None
+            return [list(row) for row in rows]
+
+
+    def flush(self):
+        """
+        Write every dirty warehouse and wait until they are on disk.
+
+        :raise OSError: If writing fails, the warehouses stay dirty so a later flush() can write them
+        """
+        self._write_group()
+        self._error = None
+
+
+    def close(self):
+        """
+        Stop the background thread and write every dirty warehouse.
+
+        :raise OSError: If writing fails, the warehouses stay dirty so flush() can be called again
+        """
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._wake.notify()
+        self._thread.join()
+        self.flush()
+        atexit.unregister(self.close)
+
+
+    def _run(self):
+        """
+        Wait for a size or time trigger, then write a group of dirty warehouses, until closed.
+        """
+        while True:
+            with self._lock:
+                if self._error:
+                    # Wait before retrying a failed group, rather than retrying straight away
+                    self._wake.wait(RETRY_DELAY)
+                elif not self._closed and len(self._dirty) < self._max_batch:
+                    self._wake.wait(self._interval)
+                if self._closed:
+                    return
+            # Catch everything, as any exception would end the thread and leave changes unwritten
+            try:
+                self._write_group()
+                self._error = None
+            except Exception as error:
+                self._error = error
+
+
+    def _write_group(self):
+        """
+        Take every dirty warehouse and write them as one group.
+        If writing fails, the warehouses are made dirty again, unless a newer version has since been written.
+        """
+        with self._write_lock:
+            with self._lock:
+                group, self._dirty = self._dirty, {}
+                self._inflight = group
+            if not group:
+                return
+            try:
+                fsync = self._durability == "fsync"
+                for path, rows in group.items():
+                    write_rows(path, rows, fsync)
+                if fsync:
+                    for directory in {os.path.dirname(os.path.abspath(path)) for path in group}:
+                        _fsync_directory(directory)
+            except BaseException:
+                with self._lock:
+                    for path, rows in group.items():
+                        self._dirty.setdefault(path, rows)
+                raise
+            finally:
+                with self._lock:
+                    self._inflight = {}
+
+
+def write_rows(path, rows, fsync=False):
+    """
+    Write rows to a csv file atomically, by writing a temporary file and replacing the original.
+
+    :param path: Path of the csv file
+    :type path: str
+    :param rows: Rows to write
+    :type rows: list
+    :param fsync: If True, wait for the file to reach the disk before replacing
+    :type fsync: bool
+    """
+    temp = path + ".tmp"
+    with open(temp, "w", newline="") as inventory:
+        writer = csv.writer(inventory)
+        writer.writerows(rows)
+        if fsync:
+            inventory.flush()
+            os.fsync(inventory.fileno())
+    os.replace(temp, path)
+
+
+def _fsync_directory(directory):
+    """
+    Fsync a directory so replaced files survive a crash. Skipped where directories cannot be opened.
+
+    :param directory: Path of the directory
+    :type directory: str
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -1,20 +1,30 @@
 import sys
 import csv
 import re
+import warnings
 from tabulate import tabulate
 
 
 # Useages for warehouse
 
 class Warehouse:
-    def __init__(self, name):
+    def __init__(self, name, alerts=None, snapshot=None, writer=None):
         """
         Initalise the Warehouse with a give name.
 
         :param name: Name of warehouse
         :type name: str
+        :param alerts: Optional engine checked after every stock change
+        :type alerts: AlertEngine
+        :param snapshot: Optional fleet snapshot kept up to date with every stock change
+        :type snapshot: FleetSnapshot
+        :param writer: Optional write-behind writer, so stock changes return without waiting for the disk
+        :type writer: WriteBehind
         """
         self._name = name
+        self._alerts = alerts
+        self._snapshot = snapshot
+        self._writer = writer
         self._contents = self.load_contents()
         self._size = self.get_size()
         self._capacity = self.get_capacity()
@@ -41,6 +51,12 @@ class Warehouse:
 
         :return: A list of contents in warehouse
         """
+        # Use contents still waiting to be written, as the csv file is out of date
+        if self._writer:
+            contents = self._writer.read(self._name)
+            if contents is not None:
+                return contents
+
         contents = []
         try:
             with open(self._name, "r") as inventory:
@@ -69,6 +85,19 @@ class Warehouse:
                 writer.writerow(["Item ID", "Item Name", "Num of Items", "Item Weight(kg)", "Item Size"])
 
 
+    def save(self):
+        """
+        Write the contents of the warehouse to its .csv file, or pass them to the write-behind writer.
+        """
+        if self._writer:
+            self._writer.write(self._name, self._contents)
+            return
+        with open(self._name, "w", newline="") as inventory:
+            writer = csv.writer(inventory)
+            for row in self._contents:
+                writer.writerow(row)
+
+
     def get_item_data(self, item):
         """
         Get item data on the requested item from external catalog.
@@ -144,9 +173,11 @@ class Warehouse:
                 if row[1] == item_name:
                     stocked = True
                     row[2] = str(int(row[2]) + int(quantity))
+                    new_quantity = int(row[2])
                     break
             if not stocked:
                 self._contents.append([item_id, item_name, quantity, item_weight, item_size])
+                new_quantity = int(quantity)
 
             # Update the space taken by stock in self._contents
             self._contents[1][1] = str(int(self._contents[1][1]) + storage_space)
@@ -154,18 +185,18 @@ class Warehouse:
             self._size += storage_space
 
             # Update csv file
-            with open(self._name, "w", newline="") as inventory:
-                writer = csv.writer(inventory)
-                for row in self._contents:
-                    writer.writerow(row)
-
-            # Stock successfully added so return True
-            return True
+            self.save()
 
         except ValueError:
             # Stock unsuccessfully added to return False
             return False
 
+        # Outside the try, so a failing hook cannot turn a completed change into a failure
+        self.stock_changed(item_id, item_name, new_quantity, int(quantity))
+
+        # Stock successfully added so return True
+        return True
+
 
     def remove_stock(self, item, quantity):
         """
@@ -182,7 +213,7 @@ class Warehouse:
         try:
             item = str(item)
             item_data = self.get_item_data(item)
-            item_name, item_size = item_data[1], item_data[3]
+            item_id, item_name, item_size = item_data[0], item_data[1], item_data[3]
             storage_space = int(item_size) * quantity
             stocked = False
             enough_stocked = False
@@ -195,9 +226,11 @@ class Warehouse:
                     if int(row[2]) > int(quantity):
                         enough_stocked = True
                         row[2] = str(int(row[2]) - int(quantity))
+                        new_quantity = int(row[2])
                     elif int(row[2]) == int(quantity):
                         enough_stocked = True
                         self._contents.remove(row)
+                        new_quantity = 0
                     elif int(row[2]) < int(quantity):
                         enough_stocked = False
                         # Not enough of item stocked in warehouse
@@ -214,13 +247,7 @@ class Warehouse:
             self._size -= storage_space
 
             # Update csv file
-            with open(self._name, "w", newline="") as inventory:
-                writer = csv.writer(inventory)
-                for row in self._contents:
-                    writer.writerow(row)
-
-            # Stock removed
-            return "1"
+            self.save()
 
         except ValueError:
             # Not enough of item stocked
@@ -229,6 +256,45 @@ class Warehouse:
             # Item not stocked
             elif stocked == False:
                 return "3"
+            # Stock not removed
+            return None
+
+        # Outside the try, so a failing hook cannot turn a completed change into a failure
+        self.stock_changed(item_id, item_name, new_quantity, -int(quantity))
+
+        # Stock removed
+        return "1"
+
+
+    def stock_changed(self, item_id, item_name, new_quantity, change):
+        """
+        Update the fleet snapshot and check alerts after a completed stock change.
+        A failing snapshot update is reported as a warning, so it cannot undo or hide the change.
+
+        :param item_id: ID of item changed
+        :type item_id: str
+        :param item_name: Name of item changed
+        :type item_name: str
+        :param new_quantity: Number of item now in warehouse
+        :type new_quantity: int
+        :param change: Number of item added (positive) or removed (negative)
+        :type change: int
+        """
+        # Update fleet snapshot
+        if self._snapshot:
+            try:
+                if self._name in self._snapshot:
+                    self._snapshot.apply(self._name, item_id, change, self._capacity)
+                else:
+                    # Contents already include this change
+                    self._snapshot.add_warehouse(self._name, self._contents)
+            except Exception as error:
+                warnings.warn(f"Fleet snapshot not updated for {self._name}: {error}")
+
+        # Check only the changed item and the warehouse totals for alerts
+        if self._alerts:
+            self._alerts.check_item(self._name, item_id, item_name, new_quantity)
+            self._alerts.check_capacity(self._name, self._size, self._capacity)
 
 
 # User interaction code
@@ -314,6 +380,23 @@ def warehouse_exists(name):
         return False
 
 
+def is_warehouse_file(path):
+    """
+    Check that a file is a warehouse .csv file, by its Capacity preset on the first row.
+
+    :param path: Path of file
+    :type path: str
+    :return: A boolean expression based on if the file is a warehouse
+    :rtype: bool
+    """
+    try:
+        with open(path, "r", newline="") as inventory:
+            row = next(csv.reader(inventory), None)
+    except (OSError, UnicodeDecodeError, csv.Error):
+        return False
+    return bool(row) and row[0] == "Capacity"
+
+
 def create_new_warehouse(name):
     """
     Create new warehouse.
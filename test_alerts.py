@@ -0,0 +1,115 @@
+import pytest
+import os
+import json
+from project import Warehouse
+from alerts import AlertEngine, JsonlSink
+
+
+TEST_WAREHOUSE_CSV = "test_alerts_warehouse.csv"
+TEST_ALERTS_JSONL = "test_alerts.jsonl"
+
+
+@pytest.fixture(autouse=True)
+def setup_teardown():
+    for path in (TEST_WAREHOUSE_CSV, TEST_ALERTS_JSONL):
+        if os.path.exists(path):
+            os.remove(path)
+
+    yield
+
+    for path in (TEST_WAREHOUSE_CSV, TEST_ALERTS_JSONL):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_low_stock_edge_triggered():
+    events = []
+    alerts = AlertEngine()
+    alerts.add_sink(events.append)
+    alerts.set_reorder_point("AirPods", 3)
+    warehouse = Warehouse(TEST_WAREHOUSE_CSV, alerts)
+
+    warehouse.add_stock("AirPods", 10)
+    assert events == []
+    warehouse.remove_stock("AirPods", 7)
+    warehouse.remove_stock("AirPods", 1)
+    warehouse.remove_stock("AirPods", 2)
+    assert [event["type"] for event in events] == ["low_stock"]
+    assert events[0]["quantity"] == 3
+
+    warehouse.add_stock("AirPods", 5)
+    assert [event["type"] for event in events] == ["low_stock", "restocked"]
+
+
+def test_reorder_point_by_item_id():
+    events = []
+    alerts = AlertEngine()
+    alerts.add_sink(events.append)
+    alerts.set_reorder_point("2", 1)
+    warehouse = Warehouse(TEST_WAREHOUSE_CSV, alerts)
+
+    warehouse.add_stock("AeroPress", 2)
+    warehouse.remove_stock("AeroPress", 2)
+
+    assert len(events) == 1
+    assert events[0]["item_name"] == "AeroPress"
+    assert events[0]["quantity"] == 0
+
+
+def test_capacity_threshold():
+    events = []
+    alerts = AlertEngine(default_fill_threshold=0.8)
+    alerts.add_sink(events.append)
+    warehouse = Warehouse(TEST_WAREHOUSE_CSV, alerts)
+
+    warehouse.add_stock("AirPods", 39)
+    assert events == []
+    warehouse.add_stock("AirPods", 1)
+    warehouse.add_stock("AirPods", 5)
+    assert [event["type"] for event in events] == ["capacity"]
+    assert events[0]["size"] == 40
+
+    warehouse.remove_stock("AirPods", 20)
+    assert [event["type"] for event in events] == ["capacity", "capacity_cleared"]
+
+
+def test_invalid_fill_threshold():
+    alerts = AlertEngine()
+
+    with pytest.raises(ValueError):
+        alerts.set_fill_threshold(1.5)
+    with pytest.raises(ValueError):
+        AlertEngine(default_fill_threshold=80)
+
+
+def test_jsonl_sink():
+    alerts = AlertEngine()
+    sink = JsonlSink(TEST_ALERTS_JSONL)
+    alerts.add_sink(sink)
+    alerts.set_fill_threshold(0.1, TEST_WAREHOUSE_CSV)
+    warehouse = Warehouse(TEST_WAREHOUSE_CSV, alerts)
+
+    warehouse.add_stock("Camping Tent", 1)
+    sink.close()
+
+    with open(TEST_ALERTS_JSONL, "r") as log:
+        lines = [json.loads(line) for line in log]
+    assert len(lines) == 1
+    assert lines[0]["type"] == "capacity"
+    assert lines[0]["warehouse"] == TEST_WAREHOUSE_CSV
+
+
+def test_failing_sink_does_not_fail_change():
+    events = []
+    alerts = AlertEngine(default_fill_threshold=0.1)
+    sink = JsonlSink(TEST_ALERTS_JSONL)
+    sink.close()
+    alerts.add_sink(sink)
+    alerts.add_sink(events.append)
+    warehouse = Warehouse(TEST_WAREHOUSE_CSV, alerts)
+
+    with pytest.warns(UserWarning):
+        assert warehouse.add_stock("Camping Tent", 1) == True
+    with pytest.warns(UserWarning):
+        assert warehouse.remove_stock("Camping Tent", 1) == "1"
+    assert [event["type"] for event in events] == ["capacity", "capacity_cleared"]
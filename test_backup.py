@@ -0,0 +1,118 @@
+import pytest
+import os
+import zlib
+import backup as backup_module
+from project import Warehouse
+from backup import backup, restore, read_header, MAGIC, HEADER, FILE, CHUNK, END
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_backup_and_restore(fleet_dir, tmp_path):
+    archive = os.path.join(tmp_path, "fleet.bak")
+    target = os.path.join(tmp_path, "restored")
+
+    assert backup(archive, fleet_dir, workers=2) == 3
+    assert restore(archive, target) == 3
+    assert sorted(os.listdir(target)) == ["catalog.csv", "london.csv", "paris.csv"]
+    for name in os.listdir(target):
+        assert read(os.path.join(target, name)) == read(os.path.join(fleet_dir, name))
+
+
+def test_incremental_backup(fleet_dir, tmp_path):
+    full = os.path.join(tmp_path, "full.bak")
+    incremental = os.path.join(tmp_path, "incremental.bak")
+    # Make every file older than the full backup
+    for name in os.listdir(fleet_dir):
+        os.utime(os.path.join(fleet_dir, name), (0, 0))
+    backup(full, fleet_dir)
+    Warehouse(os.path.join(fleet_dir, "paris.csv")).add_stock("AeroPress", 1)
+
+    assert backup(incremental, fleet_dir, since=full) == 1
+    assert read_header(incremental)[1]
+
+    target = os.path.join(tmp_path, "restored")
+    restore(full, target)
+    restore(incremental, target)
+    assert read(os.path.join(target, "paris.csv")) == read(os.path.join(fleet_dir, "paris.csv"))
+
+
+def test_corrupt_archive_not_restored(fleet_dir, tmp_path):
+    archive = os.path.join(tmp_path, "fleet.bak")
+    backup(archive, fleet_dir)
+    data = bytearray(read(archive))
+    # Flip a byte inside the last chunk's compressed data
+    data[-10] ^= 0xFF
+    with open(archive, "wb") as f:
+        f.write(data)
+
+    target = os.path.join(tmp_path, "restored")
+    with pytest.raises(ValueError):
+        restore(archive, target)
+    assert os.listdir(target) == []
+
+
+def test_truncated_archive(fleet_dir, tmp_path):
+    archive = os.path.join(tmp_path, "fleet.bak")
+    backup(archive, fleet_dir)
+    data = read(archive)
+    with open(archive, "wb") as f:
+        f.write(data[:-CHUNK.size])
+
+    with pytest.raises(ValueError):
+        restore(archive, os.path.join(tmp_path, "restored"))
+
+
+def test_not_an_archive(tmp_path):
+    with pytest.raises(ValueError):
+        restore("catalog.csv", os.path.join(tmp_path, "restored"))
+
+
+def test_failed_replace_removes_temps(fleet_dir, tmp_path, monkeypatch):
+    archive = os.path.join(tmp_path, "fleet.bak")
+    backup(archive, fleet_dir)
+    target = os.path.join(tmp_path, "restored")
+    replace = os.replace
+    calls = []
+
+    def failing_replace(src, dst):
+        calls.append(src)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        replace(src, dst)
+
+    monkeypatch.setattr(backup_module.os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        restore(archive, target)
+    assert os.listdir(target) == ["catalog.csv"]
+
+
+def test_incremental_needs_base(fleet_dir, tmp_path):
+    full = os.path.join(tmp_path, "full.bak")
+    incremental = os.path.join(tmp_path, "incremental.bak")
+    backup(full, fleet_dir)
+    backup(incremental, fleet_dir, since=full)
+
+    with pytest.raises(ValueError):
+        restore(incremental, os.path.join(tmp_path, "restored"))
+
+
+def test_oversized_chunk_rejected(fleet_dir, tmp_path):
+    archive = os.path.join(tmp_path, "fleet.bak")
+    data = b"a" * 1000
+    compressed = zlib.compress(data)
+    name = b"london.csv"
+    with open(archive, "wb") as f:
+        f.write(MAGIC + HEADER.pack(0, False))
+        f.write(b"F" + FILE.pack(len(name), 10) + name)
+        # Claims 10 bytes, but decompresses to 1000
+        f.write(b"C" + CHUNK.pack(10, len(compressed), zlib.crc32(data[:10])) + compressed)
+        f.write(b"Z" + END.pack(1))
+
+    target = os.path.join(tmp_path, "restored")
+    with pytest.raises(ValueError):
+        restore(archive, target)
+    assert os.listdir(target) == []
@@ -0,0 +1,78 @@
+import pytest
+import os
+import numpy as np
+from project import Warehouse
+from fleet import FleetSnapshot
+
+
+def test_build(fleet_dir):
+    snapshot = FleetSnapshot.build(fleet_dir)
+
+    assert snapshot.warehouses() == ["london.csv", "paris.csv"]
+    assert snapshot.item_total("AirPods") == 14
+    assert snapshot.item_total("3") == 4
+    assert snapshot.storage_used().tolist() == [20, 36]
+    assert np.allclose(snapshot.weight_stored(), [16.5, 14.2])
+    assert np.allclose(snapshot.fill_ratios(), [0.4, 0.72])
+
+
+def test_top_and_filters(fleet_dir):
+    snapshot = FleetSnapshot.build(fleet_dir)
+
+    assert snapshot.top_items(2) == [("AirPods", 14), ("AeroPress", 5)]
+    assert snapshot.top_warehouses(1, by="size") == [("paris.csv", 36)]
+    assert snapshot.warehouses_where(min_fill=0.5) == ["paris.csv"]
+    assert snapshot.warehouses_where(stocks="AeroPress") == ["london.csv"]
+    with pytest.raises(ValueError):
+        snapshot.top_warehouses(by="colour")
+
+
+def test_incremental_matches_rebuild(fleet_dir):
+    snapshot = FleetSnapshot.build(fleet_dir)
+    london = Warehouse(os.path.join(fleet_dir, "london.csv"), snapshot=snapshot)
+    london.remove_stock("AeroPress", 5)
+    london.add_stock("Charger", 3)
+    rome = Warehouse(os.path.join(fleet_dir, "rome.csv"), snapshot=snapshot)
+    rome.add_stock("AirPods", 2)
+
+    rebuilt = FleetSnapshot.build(fleet_dir)
+    assert snapshot.warehouses() == rebuilt.warehouses()
+    assert (snapshot.quantities() != rebuilt.quantities()).nnz == 0
+    assert snapshot.storage_used().tolist() == rebuilt.storage_used().tolist()
+
+
+def test_save_and_load(fleet_dir):
+    snapshot = FleetSnapshot.build(fleet_dir)
+    path = os.path.join(fleet_dir, "snapshot.npz")
+    snapshot.save(path)
+    loaded = FleetSnapshot.load(path)
+
+    assert loaded.warehouses() == snapshot.warehouses()
+    assert loaded.item_totals().tolist() == snapshot.item_totals().tolist()
+    assert loaded.item_total("AirPods") == 14
+
+
+def test_warehouse_created_after_build(fleet_dir):
+    snapshot = FleetSnapshot.build(fleet_dir)
+    path = os.path.join(fleet_dir, "berlin.csv")
+    Warehouse(path).add_stock("AirPods", 6)
+
+    # Stock already on disk is unknown to the snapshot, so a bare change is rejected
+    with pytest.raises(ValueError):
+        snapshot.apply(path, "AirPods", -1)
+
+    berlin = Warehouse(path, snapshot=snapshot)
+    assert berlin.remove_stock("AirPods", 1) == "1"
+    assert snapshot.item_total("AirPods") == 19
+    rebuilt = FleetSnapshot.build(fleet_dir)
+    assert dict(zip(snapshot.warehouses(), snapshot.storage_used().tolist())) == dict(zip(rebuilt.warehouses(), rebuilt.storage_used().tolist()))
+
+
+def test_many_new_warehouses(fleet_dir):
+    snapshot = FleetSnapshot.build(fleet_dir)
+    for i in range(100):
+        snapshot.apply(os.path.join(fleet_dir, f"new_{i}.csv"), "AirPods", 1)
+
+    assert snapshot.quantities().shape[0] == 102
+    assert snapshot.item_total("AirPods") == 114
+    assert len(snapshot.fill_ratios()) == 102
@@ -0,0 +1,156 @@
+import pytest
+import os
+import csv
+import time
+import threading
+import persistence
+from project import Warehouse
+from persistence import WriteBehind
+from fleet import FleetSnapshot
+
+
+def read_rows(path):
+    with open(path, "r") as inventory:
+        return list(csv.reader(inventory))
+
+
+def test_write_behind_flush(tmp_path):
+    path = os.path.join(tmp_path, "london.csv")
+    writer = WriteBehind(durability="none")
+    warehouse = Warehouse(path, writer=writer)
+
+    assert warehouse.add_stock("AirPods", 5)
+    assert warehouse.remove_stock("AirPods", 2) == "1"
+    # Not written yet, only the presets from creating the warehouse
+    assert len(read_rows(path)) == 3
+
+    writer.flush()
+    assert read_rows(path)[3][2] == "3"
+    writer.close()
+
+
+def test_new_warehouse_sees_pending_changes(tmp_path):
+    path = os.path.join(tmp_path, "london.csv")
+    writer = WriteBehind(durability="none")
+    Warehouse(path, writer=writer).add_stock("AirPods", 5)
+
+    warehouse = Warehouse(path, writer=writer)
+    assert warehouse.get_size() == 5
+    writer.close()
+
+
+@pytest.mark.parametrize("durability", ["interval", "fsync"])
+def test_background_group_write(tmp_path, durability):
+    writer = WriteBehind(durability=durability, max_batch=4, interval=0.01)
+    paths = [os.path.join(tmp_path, f"warehouse_{i}.csv") for i in range(10)]
+    for path in paths:
+        warehouse = Warehouse(path, writer=writer)
+        warehouse.add_stock("AeroPress", 2)
+        warehouse.add_stock("AeroPress", 1)
+
+    writer.close()
+    for path in paths:
+        assert read_rows(path)[1][1] == "6"
+        assert not os.path.exists(path + ".tmp")
+
+
+def test_closed_writer(tmp_path):
+    writer = WriteBehind()
+    writer.close()
+
+    with pytest.raises(RuntimeError):
+        writer.write(os.path.join(tmp_path, "london.csv"), [])
+
+
+def test_invalid_durability():
+    with pytest.raises(ValueError):
+        WriteBehind(durability="always")
+
+
+def test_read_during_group_write(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "london.csv")
+    writer = WriteBehind(durability="none")
+    Warehouse(path, writer=writer).add_stock("AirPods", 5)
+
+    started, release = threading.Event(), threading.Event()
+    write_rows = persistence.write_rows
+
+    def slow_write_rows(*args):
+        started.set()
+        release.wait()
+        write_rows(*args)
+
+    monkeypatch.setattr(persistence, "write_rows", slow_write_rows)
+    flusher = threading.Thread(target=writer.flush)
+    flusher.start()
+    started.wait()
+
+    # The group is being written, so the rows must still be readable
+    warehouse = Warehouse(path, writer=writer)
+    assert warehouse.get_size() == 5
+    warehouse.add_stock("AirPods", 1)
+    release.set()
+    flusher.join()
+
+    writer.close()
+    assert read_rows(path)[3][2] == "6"
+
+
+def test_failed_write_keeps_changes(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "london.csv")
+    writer = WriteBehind(durability="none")
+    Warehouse(path, writer=writer).add_stock("AirPods", 5)
+
+    def failing_write_rows(*args):
+        raise OSError("disk full")
+
+    write_rows = persistence.write_rows
+    monkeypatch.setattr(persistence, "write_rows", failing_write_rows)
+    with pytest.raises(OSError):
+        writer.flush()
+    assert writer.read(path)[1][1] == "5"
+
+    monkeypatch.setattr(persistence, "write_rows", write_rows)
+    writer.close()
+    assert read_rows(path)[1][1] == "5"
+
+
+def test_background_failure_is_retried(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "london.csv")
+    monkeypatch.setattr(persistence, "RETRY_DELAY", 0.01)
+    failed = threading.Event()
+    write_rows = persistence.write_rows
+
+    def fail_once(*args):
+        if not failed.is_set():
+            failed.set()
+            raise RuntimeError("unexpected")
+        write_rows(*args)
+
+    monkeypatch.setattr(persistence, "write_rows", fail_once)
+    writer = WriteBehind(durability="interval", interval=0.01)
+    Warehouse(path, writer=writer).add_stock("AirPods", 5)
+
+    failed.wait(1)
+    # The thread must still be running to retry the group
+    for _ in range(100):
+        if writer.read(path) is None:
+            break
+        time.sleep(0.01)
+    assert writer.read(path) is None
+    assert read_rows(path)[1][1] == "5"
+    writer.close()
+
+
+def test_snapshot_built_with_pending_changes(fleet_dir):
+    path = os.path.join(fleet_dir, "london.csv")
+    writer = WriteBehind(durability="none")
+    Warehouse(path, writer=writer).add_stock("AirPods", 5)
+
+    snapshot = FleetSnapshot.build(fleet_dir, writer=writer)
+    assert snapshot.item_total("AirPods") == 19
+    Warehouse(path, writer=writer, snapshot=snapshot).remove_stock("AirPods", 2)
+    assert snapshot.item_total("AirPods") == 17
+
+    writer.close()
+    assert FleetSnapshot.build(fleet_dir).item_total("AirPods") == 17